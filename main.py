@@ -128,7 +128,7 @@ class FruitFreshnessAndroidApp(App):
         super().__init__(**kwargs)
         self.api_key = None
         self.gemini = None
-        self.config = AppConfig()
+        self.app_config = AppConfig()  # 不可用 self.config：Kivy App.run() 會以 ConfigParser 覆寫
         self.camera = None
         self.img_preview = None
         self.result_text = None
@@ -328,7 +328,11 @@ class FruitFreshnessAndroidApp(App):
 請使用繁體中文回答，格式清晰易讀。
 """
         try:
-            result = self.gemini.analyze_image(image, prompt)
+            if self.app_config.GEMINI_STRUCTURED_OUTPUT:
+                # 結構化模式失敗時會拋出例外（而非回傳錯誤文字），由下方 except 顯示
+                result = self.gemini.analyze_image_structured(image).to_text()
+            else:
+                result = self.gemini.analyze_image(image, prompt)
         except Exception as e:
             result = f"分析失敗：{str(e)}"
 
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+純 NumPy/SciPy 的 Mel / MFCC 特徵擷取（不依賴 librosa，可在 Android 上使用）
+預設參數與 librosa 相同：n_fft=2048、hop=512、Hann 視窗、center=True、Slaney Mel 刻度
+"""
+import threading
+from functools import lru_cache
+from math import gcd
+
+import numpy as np
+from scipy import fft as sp_fft
+from scipy.signal import firwin, get_window, oaconvolve, resample_poly
+
+
+def _hz_to_mel(freqs: np.ndarray) -> np.ndarray:
+    """Slaney Mel 刻度（1 kHz 以下線性、以上對數），與 librosa htk=False 相同"""
+    freqs = np.asarray(freqs, dtype=np.float64)
+    f_sp = 200.0 / 3
+    min_log_hz = 1000.0
+    min_log_mel = min_log_hz / f_sp
+    logstep = np.log(6.4) / 27.0
+    mels = freqs / f_sp
+    log_region = freqs >= min_log_hz
+    mels[log_region] = min_log_mel + np.log(freqs[log_region] / min_log_hz) / logstep
+    return mels
+
+
+def _mel_to_hz(mels: np.ndarray) -> np.ndarray:
+    mels = np.asarray(mels, dtype=np.float64)
+    f_sp = 200.0 / 3
+    min_log_hz = 1000.0
+    min_log_mel = min_log_hz / f_sp
+    logstep = np.log(6.4) / 27.0
+    freqs = f_sp * mels
+    log_region = mels >= min_log_mel
+    freqs[log_region] = min_log_hz * np.exp(logstep * (mels[log_region] - min_log_mel))
+    return freqs
+
+
+@lru_cache(maxsize=16)
+def mel_filterbank(sr: int, n_fft: int, n_mels: int, fmin: float = 0.0, fmax: float = None) -> np.ndarray:
+    """Mel 濾波器組（n_mels x (1 + n_fft/2)，Slaney 面積正規化），依參數快取"""
+    if fmax is None:
+        fmax = sr / 2.0
+    fft_freqs = np.linspace(0, sr / 2.0, 1 + n_fft // 2)
+    mel_f = _mel_to_hz(np.linspace(_hz_to_mel(np.array([fmin]))[0],
+                                   _hz_to_mel(np.array([fmax]))[0], n_mels + 2))
+    fdiff = np.diff(mel_f)
+    ramps = mel_f[:, None] - fft_freqs[None, :]
+    lower = -ramps[:-2] / fdiff[:-1, None]
+    upper = ramps[2:] / fdiff[1:, None]
+    weights = np.maximum(0.0, np.minimum(lower, upper))
+    weights *= (2.0 / (mel_f[2:n_mels + 2] - mel_f[:n_mels]))[:, None]
+    weights = weights.astype(np.float32)
+    weights.setflags(write=False)
+    return weights
+
+
+@lru_cache(maxsize=8)
+def dct_matrix(n_mfcc: int, n_mels: int) -> np.ndarray:
+    """正交 DCT-II 矩陣的前 n_mfcc 列（等同 scipy.fft.dct(type=2, norm='ortho')）"""
+    n = np.arange(n_mels)
+    k = np.arange(n_mfcc)[:, None]
+    basis = np.cos(np.pi * k * (2 * n + 1) / (2.0 * n_mels)) * np.sqrt(2.0 / n_mels)
+    basis[0] *= np.sqrt(0.5)
+    basis = basis.astype(np.float32)
+    basis.setflags(write=False)
+    return basis
+
+
+@lru_cache(maxsize=4)
+def _hann_window(n_fft: int) -> np.ndarray:
+    window = get_window('hann', n_fft, fftbins=True).astype(np.float32)
+    window.setflags(write=False)
+    return window
+
+
+@lru_cache(maxsize=8)
+def _resample_filter(up: int, down: int) -> np.ndarray:
+    """
+    重新取樣用的低通 FIR（依 up/down 快取）。截止頻率設在目標 Nyquist 的 96%，
+    比 resample_poly 預設濾波器更接近 librosa 預設的 soxr_hq，避免高頻混疊
+    """
+    max_rate = max(up, down)
+    taps = firwin(2 * 40 * max_rate + 1, 0.96 / max_rate, window=('kaiser', 5.0)).astype(np.float32)
+    taps.setflags(write=False)
+    return taps
+
+
+class FeatureExtractor:
+    """
+    Mel 頻譜 / MFCC 擷取器。分幀與視窗緩衝區會在呼叫間重複使用，
+    因此單一實例不可跨執行緒共用，請透過 get_extractor() 取得執行緒專屬實例。
+    """
+
+    def __init__(self, target_sr: int = 22050, n_fft: int = 2048, hop_length: int = 512):
+        self.target_sr = target_sr
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self._pad_buf = np.empty(0, dtype=np.float32)
+        self._frame_buf = np.empty((0, n_fft), dtype=np.float32)
+
+    def resample(self, y: np.ndarray, sr: int) -> np.ndarray:
+        """
+        重新取樣至 target_sr，輸出 float32。整數倍降頻（如 44.1 kHz → 22.05 kHz）
+        以 FFT 卷積後抽取，結果與 resample_poly 相同但快數倍；其他比例使用多相濾波
+        """
+        y = np.asarray(y, dtype=np.float32)
+        if sr == self.target_sr:
+            return y
+        g = gcd(int(sr), int(self.target_sr))
+        up, down = self.target_sr // g, int(sr) // g
+        taps = _resample_filter(up, down)
+        if up == 1:
+            n_out = -(-len(y) // down)
+            return oaconvolve(y, taps)[(len(taps) - 1) // 2::down][:n_out].astype(np.float32, copy=False)
+        return resample_poly(y, up, down, window=taps).astype(np.float32, copy=False)
+
+    def power_spectrogram(self, y: np.ndarray) -> np.ndarray:
+        """功率頻譜（幀數 x (1 + n_fft/2)），center=True 並以 0 補邊"""
+        n_fft, hop = self.n_fft, self.hop_length
+        pad = n_fft // 2
+        total = len(y) + 2 * pad
+        if self._pad_buf.shape[0] < total:
+            self._pad_buf = np.empty(total, dtype=np.float32)
+        padded = self._pad_buf[:total]
+        padded[:pad] = 0.0
+        padded[pad:pad + len(y)] = y
+        padded[pad + len(y):] = 0.0
+
+        n_frames = 1 + (total - n_fft) // hop
+        if self._frame_buf.shape[0] < n_frames:
+            self._frame_buf = np.empty((n_frames, n_fft), dtype=np.float32)
+        frames = self._frame_buf[:n_frames]
+        view = np.lib.stride_tricks.as_strided(
+            padded, shape=(n_frames, n_fft), strides=(hop * padded.strides[0], padded.strides[0]),
+            writeable=False)
+        np.multiply(view, _hann_window(n_fft), out=frames)
+
+        spec = sp_fft.rfft(frames, axis=1)
+        power = spec.real ** 2
+        power += spec.imag ** 2
+        return power
+
+    def melspectrogram(self, y: np.ndarray, sr: int, n_mels: int = 128) -> np.ndarray:
+        """Mel 功率頻譜（n_mels x 幀數），對應 librosa.feature.melspectrogram"""
+        yr = self.resample(y, sr)
+        fb = mel_filterbank(self.target_sr, self.n_fft, n_mels)
+        return (self.power_spectrogram(yr) @ fb.T).T
+
+    def log_mel_mean(self, y: np.ndarray, sr: int, n_mels: int = 64) -> np.ndarray:
+        """log1p(Mel 頻譜) 的時間平均，供餘弦相似度使用"""
+        return np.log1p(self.melspectrogram(y, sr, n_mels=n_mels)).mean(axis=1)
+
+    def mfcc(self, y: np.ndarray, sr: int, n_mfcc: int = 13, n_mels: int = 128,
+             top_db: float = 80.0) -> np.ndarray:
+        """MFCC（n_mfcc x 幀數），對應 librosa.feature.mfcc 預設設定"""
+        S = self.melspectrogram(y, sr, n_mels=n_mels)
+        S_db = 10.0 * np.log10(np.maximum(S, 1e-10))
+        S_db = np.maximum(S_db, S_db.max() - top_db)
+        return dct_matrix(n_mfcc, n_mels) @ S_db
+
+
+_local = threading.local()
+
+
+def get_extractor() -> FeatureExtractor:
+    """取得目前執行緒專屬的 FeatureExtractor（緩衝區不會被其他執行緒覆寫）"""
+    extractor = getattr(_local, 'extractor', None)
+    if extractor is None:
+        extractor = FeatureExtractor()
+        _local.extractor = extractor
+    return extractor
+
+
+def librosa_deviation(y: np.ndarray, sr: int) -> dict:
+    """
+    以完整流程與 librosa 比較（需安裝 librosa）：參考值使用 librosa.resample + librosa.feature，
+    本模組使用自身的重新取樣與特徵擷取，因此誤差包含重新取樣器的差異。
+    回傳 Mel 平均與 MFCC 的最大相對誤差，用於在桌面環境驗證本模組的輸出。
+    """
+    import librosa
+
+    ext = get_extractor()
+    y = np.asarray(y, dtype=np.float32)
+    if sr != ext.target_sr:
+        ref_y = librosa.resample(y, orig_sr=sr, target_sr=ext.target_sr)
+    else:
+        ref_y = y
+    ref_mel = np.log1p(librosa.feature.melspectrogram(
+        y=ref_y, sr=ext.target_sr, n_mels=64, hop_length=ext.hop_length)).mean(axis=1)
+    ref_mfcc = librosa.feature.mfcc(y=ref_y, sr=ext.target_sr, n_mfcc=13)
+    mel = ext.log_mel_mean(y, sr, n_mels=64)
+    mfcc = ext.mfcc(y, sr)
+    frames = min(mfcc.shape[1], ref_mfcc.shape[1])
+    return {
+        'mel_mean_rel_error': float(np.max(np.abs(mel - ref_mel)) / (np.max(np.abs(ref_mel)) + 1e-9)),
+        'mfcc_rel_error': float(np.max(np.abs(mfcc[:, :frames] - ref_mfcc[:, :frames]))
+                                / (np.max(np.abs(ref_mfcc)) + 1e-9)),
+    }
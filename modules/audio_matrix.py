@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+兩兩 DTW 相似度矩陣：利用對稱性、DTW 下界剪枝與多行程分塊計算，
+結果寫入記憶體映射檔（.npy），N 達數千筆時也不必整個載入記憶體
+"""
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .audio_processor import SimilarityCalculator
+from .config import AppConfig
+from .audio_segmentation import active_audio
+
+# 子行程共用狀態（由 _init_worker 設定，避免每個分塊重複傳送特徵）
+_WORKER_FEATURES: List[Optional[np.ndarray]] = []
+_WORKER_PATH: str = ""
+_WORKER_THRESHOLD: Optional[float] = None
+_WORKER_FILL: float = 0.0
+
+
+@dataclass
+class MatrixStats:
+    """矩陣計算統計：總配對數、各下界剪掉的配對數與實際 DTW 次數；output_path 為矩陣檔路徑"""
+    total_pairs: int = 0
+    pruned_kim: int = 0
+    pruned_keogh: int = 0
+    dtw_runs: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+    output_path: str = ""
+
+    def add(self, counts: Tuple[int, int, int, int]):
+        self.pruned_kim += counts[0]
+        self.pruned_keogh += counts[1]
+        self.dtw_runs += counts[2]
+        self.failed += counts[3]
+
+
+def lb_kim(mf1: np.ndarray, mf2: np.ndarray) -> float:
+    """LB_Kim：DTW 路徑必經首尾兩格，其距離和為下界"""
+    first = np.linalg.norm(mf1[:, 0] - mf2[:, 0])
+    if mf1.shape[1] == 1 and mf2.shape[1] == 1:
+        return float(first)
+    return float(first + np.linalg.norm(mf1[:, -1] - mf2[:, -1]))
+
+
+def _envelope_distance(query: np.ndarray, env_lo: np.ndarray, env_hi: np.ndarray) -> float:
+    excess = np.maximum(query - env_hi[:, None], 0.0) + np.maximum(env_lo[:, None] - query, 0.0)
+    return float(np.sqrt((excess ** 2).sum(axis=0)).sum())
+
+
+def lb_keogh(mf1: np.ndarray, mf2: np.ndarray) -> float:
+    """
+    LB_Keogh（不限制視窗）：每一幀至少對齊對方的某一幀，
+    其距離不小於到對方各維度上下包絡的距離；取雙向較大者
+    """
+    d12 = _envelope_distance(mf1, mf2.min(axis=1), mf2.max(axis=1))
+    d21 = _envelope_distance(mf2, mf1.min(axis=1), mf1.max(axis=1))
+    return max(d12, d21)
+
+
+def _pair_similarity(mf1: np.ndarray, mf2: np.ndarray, threshold: Optional[float]) -> Tuple[Optional[float], int]:
+    """
+    計算單一配對；回傳 (相似度, 階段)。階段 0/1 代表被 LB_Kim / LB_Keogh 剪掉（相似度為 None），
+    2 代表執行了完整 DTW。fastdtw 距離不小於精確 DTW，因此下界剪枝不會誤刪達標配對。
+    """
+    if threshold is not None:
+        norm = max(mf1.shape[1], mf2.shape[1])
+        if SimilarityCalculator.dtw_distance_to_similarity(lb_kim(mf1, mf2), norm) < threshold:
+            return None, 0
+        if SimilarityCalculator.dtw_distance_to_similarity(lb_keogh(mf1, mf2), norm) < threshold:
+            return None, 1
+    return SimilarityCalculator.dtw_similarity_from_features(mf1, mf2), 2
+
+
+def _init_worker(features, path, threshold, fill_value):
+    global _WORKER_FEATURES, _WORKER_PATH, _WORKER_THRESHOLD, _WORKER_FILL
+    _WORKER_FEATURES = features
+    _WORKER_PATH = path
+    _WORKER_THRESHOLD = threshold
+    _WORKER_FILL = fill_value
+
+
+def _compute_tile(rows: Tuple[int, int], cols: Tuple[int, int]) -> Tuple[int, int, int, int]:
+    """計算一個分塊（只算上三角），同時寫入對稱位置"""
+    matrix = np.load(_WORKER_PATH, mmap_mode='r+')
+    counts = [0, 0, 0, 0]
+    r0, r1 = rows
+    c0, c1 = cols
+    block = np.full((r1 - r0, c1 - c0), _WORKER_FILL, dtype=matrix.dtype)
+    for i in range(r0, r1):
+        for j in range(max(c0, i), c1):
+            if i == j:
+                block[i - r0, j - c0] = 1.0
+                continue
+            mf1, mf2 = _WORKER_FEATURES[i], _WORKER_FEATURES[j]
+            if mf1 is None or mf2 is None:
+                counts[3] += 1
+                block[i - r0, j - c0] = 0.0
+                continue
+            try:
+                sim, stage = _pair_similarity(mf1, mf2, _WORKER_THRESHOLD)
+            except Exception as e:
+                print(f"[相似度計算錯誤] {e}")
+                counts[3] += 1
+                block[i - r0, j - c0] = 0.0
+                continue
+            counts[stage] += 1
+            if sim is not None:
+                block[i - r0, j - c0] = sim
+
+    if r0 == c0:
+        # 對角分塊：只算了上三角，鏡射補齊下三角
+        matrix[r0:r1, c0:c1] = np.triu(block) + np.triu(block, k=1).T
+    else:
+        matrix[r0:r1, c0:c1] = block
+        matrix[c0:c1, r0:r1] = block.T
+    matrix.flush()
+    del matrix
+    return tuple(counts)
+
+
+def _extract_features(recordings: Sequence[Tuple[np.ndarray, int]],
+                      trim_silence: bool = False) -> List[Optional[np.ndarray]]:
+    features = []
+    for y, sr in recordings:
+        try:
+            if trim_silence:
+                y, _ = active_audio(y, sr)
+            features.append(np.ascontiguousarray(SimilarityCalculator.mfcc_features(y, sr)))
+        except Exception as e:
+            print(f"[特徵擷取錯誤] {e}")
+            features.append(None)
+    return features
+
+
+def pairwise_dtw_matrix(recordings: Sequence[Tuple[np.ndarray, int]],
+                        threshold: Optional[float] = None,
+                        output_path: Optional[str] = None,
+                        tile_size: int = 64,
+                        max_workers: Optional[int] = None,
+                        fill_value: float = 0.0,
+                        trim_silence: bool = False) -> Tuple[np.memmap, MatrixStats]:
+    """
+    計算 N 筆錄音的 N x N MFCC+DTW 相似度矩陣。
+
+    recordings: [(波形, 取樣率), ...]
+    threshold: 相似度門檻；下界已證明低於門檻的配對直接填入 fill_value，None 表示不剪枝
+    output_path: 輸出 .npy 路徑；None 時建立暫存檔，路徑記錄於 MatrixStats.output_path，
+                 用完後須由呼叫端自行刪除（os.remove）
+    max_workers: 行程數；None 時使用 AppConfig.MAX_WORKERS（預設 1，即在目前行程執行，
+                 Android 等不支援多行程的環境不會 fork）
+    trim_silence: 擷取特徵前先去除靜音，大幅縮短 DTW 輸入
+    """
+    start = time.perf_counter()
+    n = len(recordings)
+    if output_path is None:
+        fd, output_path = tempfile.mkstemp(suffix='.npy', prefix='dtw_matrix_')
+        os.close(fd)
+    matrix = np.lib.format.open_memmap(output_path, mode='w+', dtype=np.float32, shape=(n, n))
+    matrix.flush()
+    del matrix
+
+    features = _extract_features(recordings, trim_silence)
+    stats = MatrixStats(total_pairs=n * (n - 1) // 2, output_path=output_path)
+
+    tile_size = max(1, tile_size)
+    bounds = [(s, min(s + tile_size, n)) for s in range(0, n, tile_size)]
+    tiles = [(bounds[a], bounds[b]) for a in range(len(bounds)) for b in range(a, len(bounds))]
+    init_args = (features, output_path, threshold, fill_value)
+
+    if max_workers is None:
+        max_workers = AppConfig.MAX_WORKERS
+    if max_workers <= 1 or len(tiles) <= 1:
+        _init_worker(*init_args)
+        for rows, cols in tiles:
+            stats.add(_compute_tile(rows, cols))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=init_args) as pool:
+            futures = [pool.submit(_compute_tile, rows, cols) for rows, cols in tiles]
+            for fut in futures:
+                stats.add(fut.result())
+
+    stats.seconds = time.perf_counter() - start
+    return np.load(output_path, mmap_mode='r+'), stats
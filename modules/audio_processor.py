@@ -4,16 +4,23 @@
 """
 import numpy as np
 from scipy.io import wavfile
-from scipy.signal import stft
 from fastdtw import fastdtw
 
-# 嘗試導入 librosa（若無則降級）
+from .audio_features import get_extractor
+
+# 嘗試導入 librosa（若無則使用內建 NumPy 特徵擷取）
 try:
     import librosa
     LIBROSA_AVAILABLE = True
 except ImportError:
     LIBROSA_AVAILABLE = False
 
+# 特徵擷取後端：'numpy'（預設，較快且不需 librosa）或 'librosa'（僅在已安裝時生效）
+FEATURE_BACKEND = 'numpy'
+
+def _use_librosa() -> bool:
+    return FEATURE_BACKEND == 'librosa' and LIBROSA_AVAILABLE
+
 def read_wav(path: str):
     """讀取 WAV 檔案，轉為 float64 並合併立體聲"""
     sr, data = wavfile.read(path)
@@ -23,73 +30,78 @@ def read_wav(path: str):
     return sr, data
 
 class SimilarityCalculator:
-    """音訊相似度計算器（與原始程式完全相同）"""
+    """
+    音訊相似度計算器（相似度公式沿用原始程式）。
+    特徵預設由 audio_features 的 NumPy 實作擷取，結果與 librosa 版本在容許誤差內一致；
+    未安裝 librosa 時不再退回原始程式的「前 64 / 13 個 STFT 頻帶」近似。
+    """
     
+    @staticmethod
+    def mel_mean_features(y: np.ndarray, sr: int) -> np.ndarray:
+        """log1p(Mel 頻譜) 的時間平均（64 維），供餘弦相似度使用"""
+        target_sr = 22050
+        if _use_librosa():
+            if sr != target_sr:
+                yr = librosa.resample(y.astype(np.float32), orig_sr=sr, target_sr=target_sr)
+            else:
+                yr = y.astype(np.float32)
+            S = librosa.feature.melspectrogram(y=yr, sr=target_sr, n_mels=64, hop_length=512)
+            return np.log1p(S).mean(axis=1)
+        return get_extractor().log_mel_mean(y, sr, n_mels=64)
+
+    @staticmethod
+    def cosine_similarity_from_features(M1: np.ndarray, M2: np.ndarray) -> float:
+        """兩組 Mel 平均特徵的餘弦相似度，換算為 0~1"""
+        num = np.dot(M1, M2)
+        den = (np.linalg.norm(M1) * np.linalg.norm(M2) + 1e-9)
+        cos = num / den
+        sim = (cos + 1) / 2
+        return float(sim)
+
     @staticmethod
     def mel_cosine_similarity(y1: np.ndarray, sr1: int, y2: np.ndarray, sr2: int) -> float:
         """Mel 頻譜餘弦相似度"""
         try:
-            target_sr = 22050
-            if LIBROSA_AVAILABLE:
-                if sr1 != target_sr:
-                    y1r = librosa.resample(y1.astype(np.float32), orig_sr=sr1, target_sr=target_sr)
-                else:
-                    y1r = y1.astype(np.float32)
-                    
-                if sr2 != target_sr:
-                    y2r = librosa.resample(y2.astype(np.float32), orig_sr=sr2, target_sr=target_sr)
-                else:
-                    y2r = y2.astype(np.float32)
-                    
-                S1 = librosa.feature.melspectrogram(y=y1r, sr=target_sr, n_mels=64, hop_length=512)
-                S2 = librosa.feature.melspectrogram(y=y2r, sr=target_sr, n_mels=64, hop_length=512)
-                M1 = np.log1p(S1).mean(axis=1)
-                M2 = np.log1p(S2).mean(axis=1)
-            else:
-                f1, t1, Z1 = stft(y1, fs=sr1, nperseg=1024)
-                f2, t2, Z2 = stft(y2, fs=sr2, nperseg=1024)
-                M1 = np.log1p(np.abs(Z1)).mean(axis=1)[:64]
-                M2 = np.log1p(np.abs(Z2)).mean(axis=1)[:64]
-                
-            num = np.dot(M1, M2)
-            den = (np.linalg.norm(M1) * np.linalg.norm(M2) + 1e-9)
-            cos = num / den
-            sim = (cos + 1) / 2
-            return float(sim)
+            M1 = SimilarityCalculator.mel_mean_features(y1, sr1)
+            M2 = SimilarityCalculator.mel_mean_features(y2, sr2)
+            return SimilarityCalculator.cosine_similarity_from_features(M1, M2)
         except Exception as e:
             print(f"[相似度計算錯誤] {e}")
             return 0.0
     
+    @staticmethod
+    def mfcc_features(y: np.ndarray, sr: int) -> np.ndarray:
+        """MFCC 特徵矩陣（n_mfcc x 幀數），供 DTW 比對使用"""
+        target_sr = 22050
+        if _use_librosa():
+            if sr != target_sr:
+                yr = librosa.resample(y.astype(np.float32), orig_sr=sr, target_sr=target_sr)
+            else:
+                yr = y.astype(np.float32)
+            return librosa.feature.mfcc(y=yr, sr=target_sr, n_mfcc=13)
+        return get_extractor().mfcc(y, sr, n_mfcc=13)
+
+    @staticmethod
+    def dtw_similarity_from_features(mf1: np.ndarray, mf2: np.ndarray) -> float:
+        """對兩組 MFCC 特徵執行 DTW，並換算為 0~1 相似度"""
+        seq1 = [tuple(col) for col in mf1.T]
+        seq2 = [tuple(col) for col in mf2.T]
+        distance, _ = fastdtw(seq1, seq2, dist=lambda x, y: np.linalg.norm(np.array(x) - np.array(y)))
+        norm = max(len(seq1), len(seq2))
+        return float(SimilarityCalculator.dtw_distance_to_similarity(distance, norm))
+
+    @staticmethod
+    def dtw_distance_to_similarity(distance: float, norm: int) -> float:
+        """DTW 距離轉相似度（距離越小越接近 1）"""
+        return 1.0 / (1.0 + distance / (norm * 50.0))
+
     @staticmethod
     def mfcc_dtw_similarity(y1: np.ndarray, sr1: int, y2: np.ndarray, sr2: int) -> float:
         """MFCC + DTW 相似度"""
         try:
-            target_sr = 22050
-            if LIBROSA_AVAILABLE:
-                if sr1 != target_sr:
-                    y1r = librosa.resample(y1.astype(np.float32), orig_sr=sr1, target_sr=target_sr)
-                else:
-                    y1r = y1.astype(np.float32)
-                    
-                if sr2 != target_sr:
-                    y2r = librosa.resample(y2.astype(np.float32), orig_sr=sr2, target_sr=target_sr)
-                else:
-                    y2r = y2.astype(np.float32)
-                    
-                mf1 = librosa.feature.mfcc(y=y1r, sr=target_sr, n_mfcc=13)
-                mf2 = librosa.feature.mfcc(y=y2r, sr=target_sr, n_mfcc=13)
-            else:
-                f1, t1, Z1 = stft(y1, fs=sr1, nperseg=1024)
-                f2, t2, Z2 = stft(y2, fs=sr2, nperseg=1024)
-                mf1 = np.abs(Z1)[:13, :]
-                mf2 = np.abs(Z2)[:13, :]
-                
-            seq1 = [tuple(col) for col in mf1.T]
-            seq2 = [tuple(col) for col in mf2.T]
-            distance, _ = fastdtw(seq1, seq2, dist=lambda x, y: np.linalg.norm(np.array(x) - np.array(y)))
-            norm = max(len(seq1), len(seq2))
-            sim = 1.0 / (1.0 + distance / (norm * 50.0))
-            return float(sim)
+            mf1 = SimilarityCalculator.mfcc_features(y1, sr1)
+            mf2 = SimilarityCalculator.mfcc_features(y2, sr2)
+            return SimilarityCalculator.dtw_similarity_from_features(mf1, mf2)
         except Exception as e:
             print(f"[相似度計算錯誤] {e}")
             return 0.0
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+音訊多階段排序引擎：先用低成本指標篩選，最後只對決選名單執行 DTW
+"""
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .audio_processor import SimilarityCalculator
+from .audio_segmentation import SegmentationResult, active_audio
+
+# 參考樣本格式：(名稱, 波形, 取樣率)
+Reference = Tuple[str, np.ndarray, int]
+
+
+@dataclass
+class RankedCandidate:
+    """單一候選樣本的排序結果（未計算的指標為 None；raw_distance 僅供同分時排序）"""
+    name: str
+    index: int
+    raw_distance: Optional[float] = None
+    mel_similarity: Optional[float] = None
+    dtw_similarity: Optional[float] = None
+    score: float = 0.0
+
+
+@dataclass
+class PreparedReference:
+    """預先計算特徵的參考樣本（mfcc 於首次進入 DTW 階段時才計算並快取）"""
+    name: str
+    y: np.ndarray
+    sr: int
+    mel_mean: Optional[np.ndarray] = None
+    mfcc: Optional[np.ndarray] = None
+    segmentation: Optional[SegmentationResult] = None
+
+
+@dataclass
+class CascadeStats:
+    """
+    各階段的候選數量、淘汰數量與耗時（秒）；
+    query_removed_frames 為查詢音訊去除的 RMS 幀數（原始取樣率、每幀 hop_length 個樣本）
+    """
+    total_candidates: int = 0
+    query_removed_frames: int = 0
+    stage_inputs: Dict[str, int] = field(default_factory=dict)
+    stage_eliminated: Dict[str, int] = field(default_factory=dict)
+    stage_seconds: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def dtw_runs(self) -> int:
+        """實際執行 DTW 的次數"""
+        return self.stage_inputs.get('dtw', 0)
+
+    def summary(self) -> str:
+        lines = [f"候選總數：{self.total_candidates}"]
+        if self.query_removed_frames:
+            lines.append(f"查詢音訊去除靜音 RMS 幀數：{self.query_removed_frames}")
+        for stage, count in self.stage_inputs.items():
+            lines.append(
+                f"[{stage}] 輸入 {count}，淘汰 {self.stage_eliminated.get(stage, 0)}，"
+                f"耗時 {self.stage_seconds.get(stage, 0.0):.3f}s"
+            )
+        return "\n".join(lines)
+
+
+class CascadeRanker:
+    """
+    多階段相似度排序：
+    1. mel：Mel 餘弦相似度（參考樣本的 Mel 平均已預先計算，整批以矩陣乘法比對），保留前 mel_keep 名
+    2. dtw：MFCC + DTW，只對剩下的決選名單計算
+    最後依 weights 融合兩項指標得到最終分數，同分時以原始分段距離排序。
+    原始分段距離不對齊時間、增益與取樣率，不適合用來淘汰候選。
+    參考樣本固定時先呼叫 prepare()，之後每次 rank() 只需擷取查詢音訊的特徵。
+    mel_keep 設為 None 代表不淘汰任何候選；
+    trim_silence 為 True 時先去除靜音，只比對有聲的敲擊片段。
+    """
+
+    DEFAULT_WEIGHTS = {'mel': 0.3, 'dtw': 0.7}
+
+    def __init__(self, mel_keep: Optional[int] = 5, weights: Optional[Dict[str, float]] = None,
+                 calculator: type = SimilarityCalculator, trim_silence: bool = False):
+        if mel_keep is not None and mel_keep < 1:
+            raise ValueError("mel_keep 必須 >= 1")
+        if weights is not None and not set(weights) <= set(self.DEFAULT_WEIGHTS):
+            unknown = ', '.join(sorted(set(weights) - set(self.DEFAULT_WEIGHTS)))
+            raise ValueError(f"weights 只接受 'mel' 與 'dtw'，未知的鍵：{unknown}")
+        self.mel_keep = mel_keep
+        self.weights = dict(self.DEFAULT_WEIGHTS if weights is None else weights)
+        self.calculator = calculator
+        self.trim_silence = trim_silence
+        self.last_stats = CascadeStats()
+        self._references: List[PreparedReference] = []
+        self._mel_matrix = np.zeros((0, 0))
+        self._mel_valid = np.zeros(0, dtype=bool)
+
+    def prepare(self, references: Sequence[Reference]) -> 'CascadeRanker':
+        """
+        預先計算參考樣本的 Mel 平均特徵（每組參考樣本只需呼叫一次）；
+        trim_silence 為 True 時參考樣本也只在此去除一次靜音
+        """
+        calc = self.calculator
+        prepared = []
+        for name, ref_y, ref_sr in references:
+            segmentation = None
+            if self.trim_silence:
+                ref_y, segmentation = active_audio(ref_y, ref_sr)
+            ref = PreparedReference(name=name, y=ref_y, sr=ref_sr, segmentation=segmentation)
+            try:
+                ref.mel_mean = np.asarray(calc.mel_mean_features(ref_y, ref_sr), dtype=np.float64)
+            except Exception as e:
+                print(f"[特徵擷取錯誤] {name}: {e}")
+            prepared.append(ref)
+
+        dims = next((r.mel_mean.shape[0] for r in prepared if r.mel_mean is not None), 0)
+        matrix = np.zeros((len(prepared), dims))
+        valid = np.zeros(len(prepared), dtype=bool)
+        for i, ref in enumerate(prepared):
+            if ref.mel_mean is not None:
+                matrix[i] = ref.mel_mean / (np.linalg.norm(ref.mel_mean) + 1e-9)
+                valid[i] = True
+        self._references = prepared
+        self._mel_matrix = matrix
+        self._mel_valid = valid
+        return self
+
+    def _reference_mfcc(self, ref: PreparedReference) -> np.ndarray:
+        if ref.mfcc is None:
+            ref.mfcc = self.calculator.mfcc_features(ref.y, ref.sr)
+        return ref.mfcc
+
+    def rank(self, y: np.ndarray, sr: int, references: Optional[Sequence[Reference]] = None,
+             top_k: Optional[int] = None) -> List[RankedCandidate]:
+        """
+        將查詢音訊與參考樣本逐階段比對，回傳依融合分數排序的決選名單。
+        references 為 None 時使用 prepare() 已準備的參考樣本；
+        各階段統計資訊存放於 self.last_stats。
+        """
+        if references is not None:
+            self.prepare(references)
+        refs = self._references
+        calc = self.calculator
+        stats = CascadeStats(total_candidates=len(refs))
+        self.last_stats = stats
+        if self.trim_silence:
+            y, segmentation = active_audio(y, sr)
+            stats.query_removed_frames = segmentation.removed_frames
+        if not refs:
+            return []
+
+        # 階段 1：Mel 餘弦相似度（查詢特徵只擷取一次）
+        start = time.perf_counter()
+        try:
+            query_mel = np.asarray(calc.mel_mean_features(y, sr), dtype=np.float64)
+        except Exception as e:
+            print(f"[相似度計算錯誤] {e}")
+            return []
+        cos = self._mel_matrix @ (query_mel / (np.linalg.norm(query_mel) + 1e-9))
+        mel_sims = np.where(self._mel_valid, (cos + 1) / 2, 0.0)
+        order = np.argsort(-mel_sims, kind='stable')
+        keep = len(order) if self.mel_keep is None else min(self.mel_keep, len(order))
+        finalists = [RankedCandidate(name=refs[i].name, index=int(i), mel_similarity=float(mel_sims[i]))
+                     for i in order[:keep]]
+        stats.stage_inputs['mel'] = len(refs)
+        stats.stage_eliminated['mel'] = len(refs) - keep
+        stats.stage_seconds['mel'] = time.perf_counter() - start
+
+        # 階段 2：MFCC + DTW（參考樣本的 MFCC 快取於 PreparedReference）
+        start = time.perf_counter()
+        try:
+            query_mfcc = calc.mfcc_features(y, sr)
+        except Exception as e:
+            print(f"[相似度計算錯誤] {e}")
+            query_mfcc = None
+        for cand in finalists:
+            ref = refs[cand.index]
+            try:
+                if query_mfcc is None:
+                    raise ValueError("查詢音訊 MFCC 擷取失敗")
+                cand.dtw_similarity = calc.dtw_similarity_from_features(query_mfcc, self._reference_mfcc(ref))
+            except Exception as e:
+                print(f"[相似度計算錯誤] {e}")
+                cand.dtw_similarity = 0.0
+            cand.raw_distance = calc.raw_segment_distance(y, ref.y)
+        stats.stage_inputs['dtw'] = len(finalists)
+        stats.stage_eliminated['dtw'] = 0
+        stats.stage_seconds['dtw'] = time.perf_counter() - start
+
+        total_w = sum(self.weights.values()) or 1.0
+        for cand in finalists:
+            cand.score = (
+                self.weights.get('mel', 0.0) * cand.mel_similarity
+                + self.weights.get('dtw', 0.0) * cand.dtw_similarity
+            ) / total_w
+        finalists.sort(key=lambda c: (-c.score, c.raw_distance))
+        return finalists if top_k is None else finalists[:top_k]
+
+    def best_match(self, y: np.ndarray, sr: int,
+                   references: Optional[Sequence[Reference]] = None) -> Optional[RankedCandidate]:
+        """回傳融合分數最高的參考樣本（無參考樣本時回傳 None）"""
+        ranked = self.rank(y, sr, references, top_k=1)
+        return ranked[0] if ranked else None
+
+
+def evaluate_top1(ranker: CascadeRanker, queries: Sequence[Reference],
+                  references: Sequence[Reference]) -> Dict[str, float]:
+    """
+    以標記資料集評估排序效果：queries 與 references 的名稱即為標籤。
+    參考樣本只準備一次；回傳 top-1 準確率、平均耗時與平均 DTW 次數，
+    便於與全量比對（mel_keep=None）比較。
+    """
+    ranker.prepare(references)
+    hits = 0
+    seconds = 0.0
+    dtw_runs = 0
+    for label, y, sr in queries:
+        start = time.perf_counter()
+        best = ranker.best_match(y, sr)
+        seconds += time.perf_counter() - start
+        dtw_runs += ranker.last_stats.dtw_runs
+        if best is not None and best.name == label:
+            hits += 1
+    n = max(len(queries), 1)
+    return {
+        'top1_accuracy': hits / n,
+        'mean_seconds': seconds / n,
+        'mean_dtw_runs': dtw_runs / n,
+    }
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+音訊分段：以幀能量（RMS）偵測敲擊事件，裁掉前後靜音或切出個別敲擊，
+縮短 DTW 輸入並避免靜音稀釋 Mel 平均
+"""
+from dataclasses import dataclass, field
+from typing import Callable, List, Tuple
+
+import numpy as np
+
+
+@dataclass
+class SegmentationResult:
+    """
+    分段結果：intervals 為 [起始樣本, 結束樣本) 區間，依序排列且互不重疊。
+    *_frames 為原始取樣率下的 RMS 幀（每幀 hop_length 個樣本），不是 MFCC 幀，
+    且不含 pad；removed_samples 則以補邊後實際保留的樣本計算
+    """
+    intervals: List[Tuple[int, int]] = field(default_factory=list)
+    total_frames: int = 0
+    active_frames: int = 0
+    removed_frames: int = 0
+    removed_samples: int = 0
+
+
+def frame_rms(y: np.ndarray, frame_length: int = 2048, hop_length: int = 512) -> np.ndarray:
+    """各幀 RMS（center=True），以平方累積和向量化計算"""
+    y = np.asarray(y, dtype=np.float64)
+    pad = frame_length // 2
+    sq = np.concatenate([np.zeros(pad), y * y, np.zeros(pad)])
+    csum = np.concatenate([[0.0], np.cumsum(sq)])
+    n_frames = 1 + max(0, len(sq) - frame_length) // hop_length
+    starts = np.arange(n_frames) * hop_length
+    energy = (csum[starts + frame_length] - csum[starts]) / frame_length
+    return np.sqrt(np.maximum(energy, 0.0))
+
+
+def active_mask(y: np.ndarray, top_db: float = 40.0, frame_length: int = 2048,
+                hop_length: int = 512) -> np.ndarray:
+    """能量高於（最大能量 - top_db）的幀視為有聲"""
+    rms = frame_rms(y, frame_length, hop_length)
+    peak = rms.max() if rms.size else 0.0
+    if peak <= 0:
+        return np.zeros(rms.shape, dtype=bool)
+    db = 20.0 * np.log10(np.maximum(rms, 1e-12) / peak)
+    return db > -top_db
+
+
+def _frames_to_samples(frames: np.ndarray, hop_length: int, n: int) -> np.ndarray:
+    return np.minimum(frames * hop_length, n)
+
+
+def trim_silence(y: np.ndarray, top_db: float = 40.0, frame_length: int = 2048,
+                 hop_length: int = 512) -> Tuple[np.ndarray, SegmentationResult]:
+    """裁掉前後靜音；全為靜音時回傳空陣列"""
+    mask = active_mask(y, top_db, frame_length, hop_length)
+    result = SegmentationResult(total_frames=int(mask.size))
+    idx = np.flatnonzero(mask)
+    if idx.size == 0:
+        result.removed_frames = result.total_frames
+        result.removed_samples = len(y)
+        return y[:0], result
+    start = int(_frames_to_samples(idx[0], hop_length, len(y)))
+    end = int(_frames_to_samples(idx[-1] + 1, hop_length, len(y)))
+    result.intervals = [(start, end)]
+    result.active_frames = int(idx[-1] - idx[0] + 1)
+    result.removed_frames = result.total_frames - result.active_frames
+    result.removed_samples = len(y) - (end - start)
+    return y[start:end], result
+
+
+def split_events(y: np.ndarray, sr: int, top_db: float = 40.0, min_gap: float = 0.08,
+                 min_duration: float = 0.02, pad: float = 0.01, frame_length: int = 2048,
+                 hop_length: int = 512) -> SegmentationResult:
+    """
+    將錄音切成個別敲擊事件。
+    min_gap：短於此秒數的靜音視為同一事件；min_duration：短於此秒數的事件捨棄；
+    pad：每個事件前後保留的秒數（補邊後重疊的事件會合併）
+    """
+    mask = active_mask(y, top_db, frame_length, hop_length)
+    result = SegmentationResult(total_frames=int(mask.size))
+    if not mask.any():
+        result.removed_frames = result.total_frames
+        result.removed_samples = len(y)
+        return result
+
+    # 找出連續有聲區段的起訖幀
+    edges = np.diff(np.concatenate([[0], mask.astype(np.int8), [0]]))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    # 合併間隔過短的區段
+    gap_frames = int(np.ceil(min_gap * sr / hop_length))
+    keep = np.concatenate([[True], (starts[1:] - ends[:-1]) > gap_frames])
+    group = np.cumsum(keep) - 1
+    merged_starts = starts[keep]
+    merged_ends = np.zeros_like(merged_starts)
+    np.maximum.at(merged_ends, group, ends)
+
+    min_frames = max(1, int(np.ceil(min_duration * sr / hop_length)))
+    long_enough = (merged_ends - merged_starts) >= min_frames
+    merged_starts, merged_ends = merged_starts[long_enough], merged_ends[long_enough]
+
+    pad_samples = int(pad * sr)
+    s = np.maximum(_frames_to_samples(merged_starts, hop_length, len(y)) - pad_samples, 0)
+    e = np.minimum(_frames_to_samples(merged_ends, hop_length, len(y)) + pad_samples, len(y))
+
+    # 補邊後相鄰事件可能重疊（間隔 < 2 * pad），再合併一次以免樣本被重複串接或計算
+    if s.size:
+        disjoint = np.concatenate([[True], s[1:] > e[:-1]])
+        s, e = s[disjoint], np.maximum.reduceat(e, np.flatnonzero(disjoint))
+    result.intervals = [(int(a), int(b)) for a, b in zip(s, e)]
+    result.active_frames = int((merged_ends - merged_starts).sum())
+    result.removed_frames = result.total_frames - result.active_frames
+    result.removed_samples = len(y) - int((e - s).sum())
+    return result
+
+
+def active_audio(y: np.ndarray, sr: int, **kwargs) -> Tuple[np.ndarray, SegmentationResult]:
+    """只保留有聲事件並串接；找不到事件時回傳原始音訊"""
+    result = split_events(y, sr, **kwargs)
+    if not result.intervals:
+        return y, result
+    return np.concatenate([y[a:b] for a, b in result.intervals]), result
+
+
+def trimmed_similarity(metric: Callable[[np.ndarray, int, np.ndarray, int], float],
+                       y1: np.ndarray, sr1: int, y2: np.ndarray, sr2: int, **kwargs) -> float:
+    """
+    先去除靜音再計算相似度，metric 如 SimilarityCalculator.mfcc_dtw_similarity。
+    任一方全為靜音時退回使用原始音訊。
+    """
+    a1, _ = active_audio(y1, sr1, **kwargs)
+    a2, _ = active_audio(y2, sr2, **kwargs)
+    return metric(a1, sr1, a2, sr2)
+
+
+def per_event_similarity(metric: Callable[[np.ndarray, int, np.ndarray, int], float],
+                         y1: np.ndarray, sr1: int, y2: np.ndarray, sr2: int, **kwargs) -> float:
+    """
+    逐事件比對：依序配對兩段錄音的敲擊事件（取較少的事件數）並取平均相似度。
+    任一方沒有事件時退回 trimmed_similarity。
+    """
+    ev1 = split_events(y1, sr1, **kwargs).intervals
+    ev2 = split_events(y2, sr2, **kwargs).intervals
+    if not ev1 or not ev2:
+        return trimmed_similarity(metric, y1, sr1, y2, sr2, **kwargs)
+    scores = [metric(y1[a1:b1], sr1, y2[a2:b2], sr2) for (a1, b1), (a2, b2) in zip(ev1, ev2)]
+    return float(np.mean(scores))
@@ -9,6 +9,7 @@ class AppConfig:
     RECORD_SECONDS: int = 5
     MAX_WORKERS: int = 1
     MAX_RETRIES: int = 4
+    GEMINI_STRUCTURED_OUTPUT: bool = False  # True 時以 JSON 結構化模式分析，回應較短
     MAX_CAMERA_SCAN: int = 4
     PREVIEW_UPDATE_DELAY: int = 33
     THUMBNAIL_SIZE: Tuple[int, int] = (120, 120)
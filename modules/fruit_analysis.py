@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+結構化分析結果：固定 JSON schema（水果種類、新鮮度、成熟度、簡短建議），
+讓模型只輸出少量 JSON，需要閱讀用文字時再於本機產生
+"""
+import json
+import math
+from dataclasses import asdict, dataclass
+
+# Gemini responseSchema（OpenAPI 子集）
+RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "fruit_type": {"type": "STRING", "description": "水果種類（繁體中文）"},
+        "freshness": {"type": "INTEGER", "description": "新鮮度評分 0-100"},
+        "ripeness": {"type": "INTEGER", "description": "成熟度評分 0-100"},
+        "advice": {"type": "STRING", "description": "保存或食用建議，30 字以內"},
+    },
+    "required": ["fruit_type", "freshness", "ripeness", "advice"],
+    "propertyOrdering": ["fruit_type", "freshness", "ripeness", "advice"],
+}
+
+STRUCTURED_PROMPT = (
+    "你是專業的水果品質分析師。請辨識圖片中的水果，"
+    "評估新鮮度與成熟度（0-100 整數），並以繁體中文給出 30 字以內的建議。"
+)
+
+
+def _score(key: str, value) -> int:
+    """將分數轉為 0~100 的整數；非數值時拋出 ValueError，超出範圍則截斷"""
+    if isinstance(value, bool):
+        raise ValueError(f"欄位 {key} 不是數值：{value!r}")
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"欄位 {key} 不是數值：{value!r}")
+    if not math.isfinite(number):
+        raise ValueError(f"欄位 {key} 不是數值：{value!r}")
+    return max(0, min(100, int(round(number))))
+
+
+@dataclass
+class FruitAnalysis:
+    """Gemini 結構化分析結果"""
+    fruit_type: str
+    freshness: int
+    ripeness: int
+    advice: str
+
+    @classmethod
+    def from_json(cls, text: str) -> 'FruitAnalysis':
+        """
+        解析模型回傳的 JSON（容許 ```json 區塊包裹）。
+        格式錯誤、缺少必要欄位或分數非數值時拋出 ValueError，不以預設值代替
+        """
+        cleaned = text.strip()
+        if cleaned.startswith("```"):
+            cleaned = cleaned.strip("`")
+            if cleaned.lower().startswith("json"):
+                cleaned = cleaned[4:]
+        try:
+            data = json.loads(cleaned)
+        except ValueError as e:
+            raise ValueError(f"無法解析 JSON 回應：{e}")
+        if not isinstance(data, dict):
+            raise ValueError(f"JSON 回應格式錯誤：{text}")
+        missing = [key for key in RESPONSE_SCHEMA["required"] if data.get(key) is None]
+        if missing:
+            raise ValueError(f"JSON 回應缺少欄位：{', '.join(missing)}")
+        return cls(
+            fruit_type=str(data["fruit_type"]),
+            freshness=_score("freshness", data["freshness"]),
+            ripeness=_score("ripeness", data["ripeness"]),
+            advice=str(data["advice"]),
+        )
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def to_text(self) -> str:
+        """在本機產生易讀的文字報告（不需再呼叫 API）"""
+        return (
+            f"1. 水果種類：{self.fruit_type}\n"
+            f"2. 新鮮度：{self.freshness} / 100\n"
+            f"3. 成熟度：{self.ripeness} / 100\n"
+            f"4. 建議：{self.advice}"
+        )
@@ -2,6 +2,8 @@ import os
 import time
 from PIL import Image
 
+from .fruit_analysis import FruitAnalysis, RESPONSE_SCHEMA, STRUCTURED_PROMPT
+
 # 嘗試導入 google-genai，失敗時記錄錯誤但不崩潰
 try:
     import google.genai as genai
@@ -14,7 +16,8 @@ except ImportError as e:
     genai = None
 
 class GeminiAnalyzer:
-    def __init__(self, api_key: str = None, model_name: str = "gemini-2.5-flash", max_retries: int = 4):
+    def __init__(self, api_key: str = None, model_name: str = "gemini-2.5-flash", max_retries: int = 4,
+                 base_url: str = None):
         self.model_name = model_name
         self.max_retries = max_retries
         
@@ -25,18 +28,24 @@ class GeminiAnalyzer:
             raise ImportError("❌ google.genai 套件未安裝或無法載入")
         
         try:
-            self.client = genai.Client(api_key=api_key)
+            if base_url:
+                # 指向本機模擬伺服器等替代端點（不含 /v1beta/models 路徑）
+                self.client = genai.Client(api_key=api_key, http_options={"base_url": base_url})
+            else:
+                self.client = genai.Client(api_key=api_key)
             print(f"✅ Gemini 客戶端初始化成功")
         except Exception as e:
             raise RuntimeError(f"❌ Gemini 客戶端初始化失敗: {e}")
     
-    def analyze_image(self, image: Image.Image, prompt: str) -> str:
-        """分析圖片"""
+    def _generate(self, contents, config: dict = None) -> str:
+        """呼叫 generate_content（含指數退避重試），回傳文字內容"""
         for attempt in range(self.max_retries):
             try:
+                kwargs = {"config": config} if config else {}
                 response = self.client.models.generate_content(
                     model=f"models/{self.model_name}",
-                    contents=[prompt, image]
+                    contents=contents,
+                    **kwargs
                 )
                 return response.text if hasattr(response, 'text') else str(response)
             except Exception as e:
@@ -44,4 +53,19 @@ class GeminiAnalyzer:
                 if attempt < self.max_retries - 1:
                     time.sleep(2 ** attempt)
                     continue
-                raise
\ No newline at end of file
+                raise
+    
+    def analyze_image(self, image: Image.Image, prompt: str) -> str:
+        """分析圖片"""
+        return self._generate([prompt, image])
+    
+    def analyze_image_structured(self, image: Image.Image, prompt: str = STRUCTURED_PROMPT) -> FruitAnalysis:
+        """結構化分析：要求 JSON 輸出並解析為 FruitAnalysis（格式錯誤時拋出 ValueError）"""
+        text = self._generate(
+            [prompt, image],
+            config={
+                "response_mime_type": "application/json",
+                "response_schema": RESPONSE_SCHEMA,
+            }
+        )
+        return FruitAnalysis.from_json(text)
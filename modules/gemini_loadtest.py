@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+Gemini 客戶端壓力測試：透過實際的客戶端程式碼，對本機模擬伺服器並行送出 N 次分析，
+回報吞吐量與 p50/p95/p99 延遲
+
+    python -m modules.gemini_loadtest --requests 200 --concurrency 16 --rate-limit-rate 0.1
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from PIL import Image
+
+from .gemini_mock import GeminiMockServer, MockConfig, MockStats
+
+# GeminiRESTClient.analyze_image 失敗時回傳文字而非拋出例外，以字首判斷；
+# analyze_image_structured 與 GeminiAnalyzer 失敗時則拋出例外
+_REST_ERROR_PREFIXES = ("API 錯誤", "分析失敗", "無法解析回應")
+
+DEFAULT_PROMPT = "請分析這張水果圖片的種類、新鮮度與成熟度。"
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """最近秩百分位數（values 為空時回傳 0）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(min(rank, len(ordered))) - 1]
+
+
+@dataclass
+class LoadTestReport:
+    """壓力測試結果（延遲單位：秒）"""
+    client: str
+    requests: int
+    concurrency: int
+    ok: int = 0
+    failed: int = 0
+    wall_seconds: float = 0.0
+    latencies: List[float] = field(default_factory=list, repr=False)
+    server: Optional[MockStats] = None
+
+    @property
+    def throughput(self) -> float:
+        return self.requests / self.wall_seconds if self.wall_seconds > 0 else 0.0
+
+    def summary(self) -> str:
+        lines = [
+            f"客戶端：{self.client}　請求數：{self.requests}　並行數：{self.concurrency}",
+            f"成功：{self.ok}　失敗：{self.failed}　總耗時：{self.wall_seconds:.2f}s　吞吐量：{self.throughput:.2f} req/s",
+            f"延遲 p50：{percentile(self.latencies, 50) * 1000:.0f} ms　"
+            f"p95：{percentile(self.latencies, 95) * 1000:.0f} ms　"
+            f"p99：{percentile(self.latencies, 99) * 1000:.0f} ms",
+        ]
+        if self.server is not None:
+            s = self.server
+            lines.append(
+                f"伺服器端：收到 {s.requests} 次請求（429：{s.rate_limited}，錯誤：{s.errors}），"
+                f"傳送 {s.bytes_sent / 1024:.1f} KiB"
+            )
+            if s.by_version:
+                lines.append("API 版本：" + "，".join(f"{v} {n} 次" for v, n in sorted(s.by_version.items())))
+        return "\n".join(lines)
+
+
+def make_analyzer(kind: str, base_url: str, max_retries: int = 4):
+    """建立指向 base_url 的客戶端；kind 為 'rest'（GeminiRESTClient）或 'sdk'（GeminiAnalyzer）"""
+    if kind == 'rest':
+        from .gemini_rest import GeminiRESTClient
+        return GeminiRESTClient(api_key="mock-key", base_url=f"{base_url}/v1/models")
+    if kind == 'sdk':
+        from .gemini_client import GeminiAnalyzer
+        return GeminiAnalyzer(api_key="mock-key", max_retries=max_retries, base_url=base_url)
+    raise ValueError(f"未知的客戶端類型：{kind}")
+
+
+def _timed_call(call: Callable[[], object]):
+    start = time.perf_counter()
+    try:
+        result = call()
+        ok = not (isinstance(result, str) and result.startswith(_REST_ERROR_PREFIXES))
+    except Exception:
+        ok = False
+    return ok, time.perf_counter() - start
+
+
+def run_load_test(analyzer, requests: int = 100, concurrency: int = 8,
+                  image: Optional[Image.Image] = None, prompt: str = DEFAULT_PROMPT,
+                  client_name: str = '', structured: bool = False) -> LoadTestReport:
+    """
+    以 concurrency 個執行緒重播 requests 次分析，回傳統計結果。
+    structured 為 True 時改用 analyze_image_structured（JSON 回應模式）
+    """
+    image = image or Image.new('RGB', (640, 480), (200, 60, 40))
+    if structured:
+        call = lambda: analyzer.analyze_image_structured(image)
+    else:
+        call = lambda: analyzer.analyze_image(image, prompt)
+    report = LoadTestReport(client=client_name or type(analyzer).__name__,
+                            requests=requests, concurrency=concurrency)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = [pool.submit(_timed_call, call) for _ in range(requests)]
+        for fut in futures:
+            ok, latency = fut.result()
+            report.latencies.append(latency)
+            if ok:
+                report.ok += 1
+            else:
+                report.failed += 1
+    report.wall_seconds = time.perf_counter() - start
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gemini 客戶端離線壓力測試")
+    parser.add_argument('--client', choices=('rest', 'sdk'), default='rest')
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--structured', action='store_true', help="使用結構化 JSON 回應模式")
+    parser.add_argument('--max-retries', type=int, default=4, help="GeminiAnalyzer 重試次數")
+    parser.add_argument('--base-url', default=None, help="使用既有伺服器（不啟動內建模擬伺服器）")
+    parser.add_argument('--latency', choices=('fixed', 'uniform', 'lognormal'), default='lognormal')
+    parser.add_argument('--latency-mean', type=float, default=0.8)
+    parser.add_argument('--latency-spread', type=float, default=0.4)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0)
+    parser.add_argument('--response-chars', type=int, default=600)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    if args.base_url:
+        analyzer = make_analyzer(args.client, args.base_url.rstrip('/'), args.max_retries)
+        report = run_load_test(analyzer, args.requests, args.concurrency, client_name=args.client,
+                               structured=args.structured)
+    else:
+        config = MockConfig(latency=args.latency, latency_mean=args.latency_mean,
+                            latency_spread=args.latency_spread, error_rate=args.error_rate,
+                            rate_limit_rate=args.rate_limit_rate, response_chars=args.response_chars,
+                            seed=args.seed)
+        with GeminiMockServer(config, backlog=max(128, args.concurrency * 2)) as server:
+            analyzer = make_analyzer(args.client, server.url, args.max_retries)
+            report = run_load_test(analyzer, args.requests, args.concurrency, client_name=args.client,
+                                   structured=args.structured)
+            report.server = server.stats
+    print(report.summary())
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+本機 Gemini 模擬伺服器：實作 generateContent / streamGenerateContent 的請求與回應格式，
+可設定延遲分布、錯誤與 429 注入比例、回應長度，用於離線測量客戶端效能
+"""
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+# /{版本}/models/{模型}:{方法}，版本可為 v1 或 v1beta
+_PATH_RE = re.compile(r'^/(?P<version>v1[a-z0-9]*)/models/(?P<model>[^:/]+):(?P<method>\w+)')
+
+
+@dataclass
+class MockConfig:
+    """模擬伺服器設定（延遲單位：秒）"""
+    latency: str = 'lognormal'          # 'fixed' | 'uniform' | 'lognormal'
+    latency_mean: float = 0.8
+    latency_spread: float = 0.4         # uniform 為半寬；lognormal 為 sigma
+    error_rate: float = 0.0             # 回傳 500 的比例
+    rate_limit_rate: float = 0.0        # 回傳 429 的比例
+    retry_after: int = 1
+    response_chars: int = 600
+    stream_chunks: int = 4
+    seed: Optional[int] = None
+
+    def sample_latency(self, rng: random.Random) -> float:
+        if self.latency == 'fixed':
+            return max(0.0, self.latency_mean)
+        if self.latency == 'uniform':
+            return max(0.0, rng.uniform(self.latency_mean - self.latency_spread,
+                                        self.latency_mean + self.latency_spread))
+        # lognormal：以 latency_mean 為中位數
+        return rng.lognormvariate(0.0, self.latency_spread) * self.latency_mean
+
+
+@dataclass
+class MockStats:
+    """伺服器端統計（可用來觀察客戶端重試放大效應；by_version 記錄各 API 版本路徑的請求數）"""
+    requests: int = 0
+    ok: int = 0
+    errors: int = 0
+    rate_limited: int = 0
+    bytes_sent: int = 0
+    by_method: Dict[str, int] = field(default_factory=dict)
+    by_version: Dict[str, int] = field(default_factory=dict)
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    server_version = "GeminiMock/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload, extra_headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (extra_headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+        return len(body)
+
+    def do_POST(self):
+        mock: 'GeminiMockServer' = self.server.mock
+        cfg = mock.config
+        match = _PATH_RE.match(self.path)
+        length = int(self.headers.get('Content-Length', 0) or 0)
+        raw = self.rfile.read(length) if length else b''
+
+        if not match or match.group('method') not in ('generateContent', 'streamGenerateContent'):
+            mock.record('unknown', 'error', self._send_json(404, _error(404, 'NOT_FOUND', 'Unknown endpoint')))
+            return
+        method = match.group('method')
+        version = match.group('version')
+        try:
+            request = json.loads(raw or b'{}')
+        except ValueError:
+            mock.record(method, 'error', self._send_json(400, _error(400, 'INVALID_ARGUMENT', 'Invalid JSON')), version)
+            return
+
+        delay, outcome = mock.draw()
+        time.sleep(delay)
+
+        if outcome == 'rate_limited':
+            sent = self._send_json(429, _error(429, 'RESOURCE_EXHAUSTED', 'Quota exceeded (mock)'),
+                                   {'Retry-After': str(cfg.retry_after)})
+            mock.record(method, outcome, sent, version)
+            return
+        if outcome == 'error':
+            mock.record(method, outcome, self._send_json(500, _error(500, 'INTERNAL', 'Injected error (mock)')), version)
+            return
+
+        text = mock.response_text(request)
+        if method == 'generateContent':
+            mock.record(method, 'ok', self._send_json(200, _response(text, match.group('model'))), version)
+            return
+
+        # streamGenerateContent：alt=sse 時以 SSE 分段傳送，否則回傳 JSON 陣列
+        chunks = _split(text, cfg.stream_chunks)
+        if 'alt=sse' in self.path:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream; charset=UTF-8')
+            self.end_headers()
+            sent = 0
+            for chunk in chunks:
+                data = f"data: {json.dumps(_response(chunk, match.group('model')), ensure_ascii=False)}\r\n\r\n"
+                encoded = data.encode('utf-8')
+                self.wfile.write(encoded)
+                self.wfile.flush()
+                sent += len(encoded)
+            mock.record(method, 'ok', sent, version)
+        else:
+            payload = [_response(chunk, match.group('model')) for chunk in chunks]
+            mock.record(method, 'ok', self._send_json(200, payload), version)
+
+
+def _error(code: int, status: str, message: str) -> dict:
+    return {"error": {"code": code, "message": message, "status": status}}
+
+
+def _response(text: str, model: str) -> dict:
+    return {
+        "candidates": [{
+            "content": {"parts": [{"text": text}], "role": "model"},
+            "finishReason": "STOP",
+            "index": 0,
+        }],
+        "usageMetadata": {
+            "promptTokenCount": 258,
+            "candidatesTokenCount": max(1, len(text) // 2),
+            "totalTokenCount": 258 + max(1, len(text) // 2),
+        },
+        "modelVersion": model,
+    }
+
+
+def _split(text: str, parts: int):
+    parts = max(1, parts)
+    size = max(1, -(-len(text) // parts))
+    return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+
+class GeminiMockServer:
+    """
+    在背景執行緒啟動的模擬伺服器；可作為 context manager 使用：
+
+        with GeminiMockServer(MockConfig(latency_mean=0.2)) as server:
+            client = GeminiRESTClient(api_key="mock", base_url=server.base_url)
+    """
+
+    def __init__(self, config: Optional[MockConfig] = None, host: str = '127.0.0.1', port: int = 0,
+                 backlog: int = 128):
+        self.config = config or MockConfig()
+        self.stats = MockStats()
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        # 標準庫預設 listen backlog 只有 5；客戶端每次請求都新開連線，並行數稍高就會溢出，
+        # 被丟棄的 SYN 約 1 秒後才重送，量到的會是伺服器排隊而非客戶端延遲
+        self._httpd = ThreadingHTTPServer((host, port), _MockHandler, bind_and_activate=False)
+        self._httpd.request_queue_size = max(5, backlog)
+        try:
+            self._httpd.server_bind()
+            self._httpd.server_activate()
+        except Exception:
+            self._httpd.server_close()
+            raise
+        self._httpd.daemon_threads = True
+        self._httpd.mock = self
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def base_url(self) -> str:
+        """對應 GeminiRESTClient 的 base_url（含 /v1/models）"""
+        return f"{self.url}/v1/models"
+
+    def draw(self):
+        """抽樣本次請求的延遲與結果（ok / error / rate_limited）"""
+        cfg = self.config
+        with self._lock:
+            delay = cfg.sample_latency(self._rng)
+            roll = self._rng.random()
+        if roll < cfg.rate_limit_rate:
+            return delay, 'rate_limited'
+        if roll < cfg.rate_limit_rate + cfg.error_rate:
+            return delay, 'error'
+        return delay, 'ok'
+
+    def response_text(self, request: dict) -> str:
+        """要求 JSON 輸出時回傳符合 schema 的精簡 JSON，否則回傳 response_chars 長度的文字"""
+        gen_config = request.get('generationConfig') or request.get('generation_config') or {}
+        mime = gen_config.get('responseMimeType') or gen_config.get('response_mime_type')
+        if mime == 'application/json':
+            return json.dumps({"fruit_type": "蘋果", "freshness": 85, "ripeness": 70,
+                               "advice": "冷藏保存，三天內食用"}, ensure_ascii=False)
+        base = "【模擬回應】水果種類：蘋果；新鮮度：85；成熟度：70；建議：冷藏保存，三天內食用。"
+        n = max(1, self.config.response_chars)
+        return (base * (n // len(base) + 1))[:n]
+
+    def record(self, method: str, outcome: str, sent: int, version: Optional[str] = None):
+        with self._lock:
+            s = self.stats
+            s.requests += 1
+            s.bytes_sent += sent
+            s.by_method[method] = s.by_method.get(method, 0) + 1
+            if version:
+                s.by_version[version] = s.by_version.get(version, 0) + 1
+            if outcome == 'ok':
+                s.ok += 1
+            elif outcome == 'rate_limited':
+                s.rate_limited += 1
+            else:
+                s.errors += 1
+
+    def start(self) -> 'GeminiMockServer':
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
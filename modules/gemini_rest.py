@@ -1,6 +1,12 @@
 # modules/gemini_rest.py
 """
 Gemini REST API 客戶端 - 不依賴 google-genai 套件
+
+錯誤處理慣例：
+- analyze_image / analyze_text 失敗時不拋出例外，而是回傳以「API 錯誤」「無法解析回應」
+  「分析失敗」開頭的文字（沿用原始行為，可直接顯示於介面）
+- analyze_image_structured 回傳 FruitAnalysis，失敗時拋出 RuntimeError
+  （請求或 API 錯誤）或 ValueError（JSON 不符合 schema），呼叫端需自行捕捉
 """
 import requests
 import base64
@@ -8,83 +14,111 @@ import json
 import io
 from PIL import Image
 
+from .fruit_analysis import FruitAnalysis, RESPONSE_SCHEMA, STRUCTURED_PROMPT
+
 class GeminiRESTClient:
-    def __init__(self, api_key: str, model_name: str = "gemini-2.5-flash"):
+    DEFAULT_BASE_URL = "https://generativelanguage.googleapis.com/v1/models"
+    # responseMimeType / responseSchema（含 propertyOrdering）文件記載於 v1beta，結構化請求改走 v1beta
+    STRUCTURED_BASE_URL = "https://generativelanguage.googleapis.com/v1beta/models"
+
+    def __init__(self, api_key: str, model_name: str = "gemini-2.5-flash", base_url: str = None,
+                 structured_base_url: str = None):
         self.api_key = api_key
         self.model_name = model_name
-        self.base_url = "https://generativelanguage.googleapis.com/v1/models"
+        # base_url 可指向本機模擬伺服器（見 modules/gemini_mock.py）
+        self.base_url = (base_url or self.DEFAULT_BASE_URL).rstrip("/")
+        # 未指定 structured_base_url 時，由 base_url 的 /v1/models 換成 /v1beta/models
+        if structured_base_url is None and base_url:
+            structured_base_url = self._beta_url(self.base_url)
+        self.structured_base_url = (structured_base_url or self.STRUCTURED_BASE_URL).rstrip("/")
+
+    @staticmethod
+    def _beta_url(base_url: str) -> str:
+        """將 .../v1/models 換成 .../v1beta/models（其他格式原樣回傳）"""
+        if base_url.endswith("/v1/models"):
+            return base_url[:-len("/v1/models")] + "/v1beta/models"
+        return base_url
+        
+    @staticmethod
+    def _encode_image(image: Image.Image) -> str:
+        """將 PIL Image 轉為 JPEG base64 字串"""
+        buffered = io.BytesIO()
+        image.save(buffered, format="JPEG")
+        return base64.b64encode(buffered.getvalue()).decode()
+
+    def _image_contents(self, image: Image.Image, prompt: str) -> list:
+        """組成「提示文字 + JPEG 圖片」的 contents"""
+        return [{
+            "parts": [
+                {"text": prompt},
+                {
+                    "inline_data": {
+                        "mime_type": "image/jpeg",
+                        "data": self._encode_image(image)
+                    }
+                }
+            ]
+        }]
+
+    def _post_generate(self, data: dict, base_url: str = None) -> str:
+        """
+        送出 generateContent 請求並回傳第一個候選的文字（base_url 預設為 self.base_url）。
+        失敗時拋出 RuntimeError，訊息格式與 analyze_image 回傳的錯誤文字相同。
+        """
+        url = f"{base_url or self.base_url}/{self.model_name}:generateContent?key={self.api_key}"
+        
+        headers = {
+            "Content-Type": "application/json"
+        }
         
-    def analyze_image(self, image: Image.Image, prompt: str) -> str:
-        """分析圖片並回傳結果"""
         try:
-            # 將 PIL Image 轉為 base64
-            buffered = io.BytesIO()
-            image.save(buffered, format="JPEG")
-            img_str = base64.b64encode(buffered.getvalue()).decode()
-            
-            # 準備請求資料
-            url = f"{self.base_url}/{self.model_name}:generateContent?key={self.api_key}"
-            
-            headers = {
-                "Content-Type": "application/json"
-            }
-            
-            data = {
-                "contents": [{
-                    "parts": [
-                        {"text": prompt},
-                        {
-                            "inline_data": {
-                                "mime_type": "image/jpeg",
-                                "data": img_str
-                            }
-                        }
-                    ]
-                }]
-            }
-            
-            # 發送請求
             response = requests.post(url, headers=headers, json=data, timeout=30)
-            
-            if response.status_code == 200:
-                result = response.json()
-                # 解析回應
-                try:
-                    text = result['candidates'][0]['content']['parts'][0]['text']
-                    return text
-                except (KeyError, IndexError):
-                    return f"無法解析回應：{result}"
-            else:
-                return f"API 錯誤 ({response.status_code}): {response.text}"
-                
+        except Exception as e:
+            raise RuntimeError(f"分析失敗：{str(e)}")
+        
+        if response.status_code != 200:
+            raise RuntimeError(f"API 錯誤 ({response.status_code}): {response.text}")
+        
+        result = response.json()
+        try:
+            return result['candidates'][0]['content']['parts'][0]['text']
+        except (KeyError, IndexError):
+            raise RuntimeError(f"無法解析回應：{result}")
+
+    def analyze_image(self, image: Image.Image, prompt: str) -> str:
+        """分析圖片並回傳結果（失敗時回傳錯誤文字）"""
+        try:
+            return self._post_generate({"contents": self._image_contents(image, prompt)})
+        except RuntimeError as e:
+            return str(e)
         except Exception as e:
             return f"分析失敗：{str(e)}"
     
     def analyze_text(self, text: str) -> str:
-        """純文字分析"""
+        """純文字分析（失敗時回傳錯誤文字）"""
+        data = {
+            "contents": [{
+                "parts": [{"text": text}]
+            }]
+        }
         try:
-            url = f"{self.base_url}/{self.model_name}:generateContent?key={self.api_key}"
-            
-            headers = {
-                "Content-Type": "application/json"
-            }
-            
-            data = {
-                "contents": [{
-                    "parts": [{"text": text}]
-                }]
-            }
-            
-            response = requests.post(url, headers=headers, json=data, timeout=30)
-            
-            if response.status_code == 200:
-                result = response.json()
-                try:
-                    return result['candidates'][0]['content']['parts'][0]['text']
-                except (KeyError, IndexError):
-                    return f"無法解析回應：{result}"
-            else:
-                return f"API 錯誤 ({response.status_code}): {response.text}"
-                
+            return self._post_generate(data)
+        except RuntimeError as e:
+            return str(e)
         except Exception as e:
-            return f"分析失敗：{str(e)}"
\ No newline at end of file
+            return f"分析失敗：{str(e)}"
+    
+    def analyze_image_structured(self, image: Image.Image, prompt: str = STRUCTURED_PROMPT) -> FruitAnalysis:
+        """
+        結構化分析：要求模型依 RESPONSE_SCHEMA 輸出 JSON 並解析為 FruitAnalysis，
+        回應遠短於自由文字報告。請求送往 structured_base_url（v1beta）。
+        與 analyze_image 不同，失敗時拋出 RuntimeError / ValueError 而非回傳錯誤文字。
+        """
+        data = {
+            "contents": self._image_contents(image, prompt),
+            "generationConfig": {
+                "responseMimeType": "application/json",
+                "responseSchema": RESPONSE_SCHEMA
+            }
+        }
+        return FruitAnalysis.from_json(self._post_generate(data, self.structured_base_url))